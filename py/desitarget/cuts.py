@@ -1258,6 +1258,15 @@ def _isonnorthphotsys(photsys):
         raise ValueError("NoneType submitted to _isonnorthphotsys function")
 
     psftype = np.asarray(photsys)
+    # ADM PHOTSYS is a one-character string: unicode ('U1') as read by
+    # ADM io.read_tractor with fitsio >= 1, or bytes ('S1') as returned
+    # ADM by io.release_to_photsys. Either can be tested as an integer
+    # ADM character code far faster than via a string comparison.
+    if psftype.dtype == np.dtype('U1'):
+        return psftype.view(np.uint32) == ord('N')
+    if psftype.dtype == np.dtype('S1'):
+        return psftype.view(np.uint8) == ord('N')
+
     # ADM in Python3 these string literals become byte-like
     # ADM so to retain Python2 compatibility we need to check
     # ADM against both bytes and unicode
@@ -2365,13 +2374,19 @@ def select_targets(infiles, numproc=4, qso_selection='randomforest',
 
     # - Parallel process input files
     if numproc > 1:
+        # ADM process the largest files first, so that the pool isn't
+        # ADM left waiting on a single large file at the end of the run.
+        order = np.argsort([os.path.getsize(fn) for fn in infiles])[::-1]
+        sortedfiles = [infiles[i] for i in order]
         pool = sharedmem.MapReduce(np=numproc)
         with pool:
             if sandbox:
                 log.info("You're in the sandbox...")
-                targets = pool.map(_select_sandbox_targets_file, infiles, reduce=_update_status)
+                targets = pool.map(_select_sandbox_targets_file, sortedfiles, reduce=_update_status)
             else:
-                targets = pool.map(_select_targets_file, infiles, reduce=_update_status)
+                targets = pool.map(_select_targets_file, sortedfiles, reduce=_update_status)
+        # ADM restore the original order of the input files.
+        targets = [targets[i] for i in np.argsort(order)]
     else:
         targets = list()
         if sandbox:
@@ -19,12 +19,15 @@ import numpy.lib.recfunctions as rfn
 import healpy as hp
 from glob import glob, iglob
 from time import time
+from functools import lru_cache
+from collections import Counter
 
 from desiutil import depend
 from desitarget.geomask import hp_in_box, box_area, is_in_box
 from desitarget.geomask import hp_in_cap, cap_area, is_in_cap
 from desitarget.geomask import is_in_hp, nside2nside, pixarea2nside
 from desitarget.targets import main_cmx_or_sv
+from desitarget.internal import sharedmem
 
 # ADM set up the DESI default logger
 from desiutil.log import get_logger
@@ -37,6 +40,28 @@ log = get_logger()
 releasedict = {3000: 'S', 4000: 'N', 5000: 'S', 6000: 'N', 7000: 'S', 7999: 'S',
                8000: 'S', 8001: 'N'}
 
+# ADM the RELEASE numbers in releasedict, and a (read-only) look-up
+# ADM array indexed by RELEASE that returns the corresponding PHOTSYS.
+_releasenums = tuple(releasedict)
+_release_to_photsys = np.empty(max(_releasenums)+1, dtype='|S1')
+_release_to_photsys[list(_releasenums)] = list(releasedict.values())
+_release_to_photsys.flags.writeable = False
+
+# ADM regular expression to extract the Data Release number from a directory.
+_drre = re.compile(r"dr(\d+)")
+
+# ADM regular expression to extract a brick name from a tractor file name.
+# Match filename tractor-0003p027.fits -> brickname 0003p027.
+# Also match tractor-00003p0027.fits, just in case.
+_brickre = re.compile(r"tractor-(\d{4,5}[pm]\d{3,4})\.fits")
+
+# ADM cache of check_hp_target_dir() results, keyed by directory name.
+# ADM see also _clear_hp_target_dir_cache().
+_hp_target_dir_cache = {}
+
+# ADM fitsio v1.0 started converting byte strings to unicode strings.
+_fitsio_v1 = int(fitsio.__version__.split('.')[0]) >= 1
+
 # ADM this is an empty array of the full TS data model columns and dtypes
 # ADM other columns can be added in read_tractor.
 tsdatamodel = np.array([], dtype=[
@@ -105,8 +130,7 @@ def add_photsys(indata):
         # ADM add PHOTSYS to the data model.
         # ADM the fitsio check is a hack for the v0.9 to v1.0 transition
         # ADM (v1.0 now converts all byte strings to unicode strings).
-        from distutils.version import LooseVersion
-        if LooseVersion(fitsio.__version__) >= LooseVersion('1'):
+        if _fitsio_v1:
             pdt = [('PHOTSYS', '<U1')]
         else:
             pdt = [('PHOTSYS', '|S1')]
@@ -116,9 +140,10 @@ def add_photsys(indata):
         nrows = len(indata)
         outdata = np.empty(nrows, dtype=dt)
 
-        # ADM ...and populate them with the passed columns of data.
-        for col in indata.dtype.names:
-            outdata[col] = indata[col]
+        # ADM ...and populate them with the passed columns of data. Assigning
+        # ADM through a multi-field view copies all of the columns in one
+        # ADM pass, rather than making a separate pass for every column.
+        outdata[list(indata.dtype.names)] = indata
 
         # ADM add the PHOTSYS column.
         photsys = release_to_photsys(indata["RELEASE"])
@@ -129,6 +154,18 @@ def add_photsys(indata):
     return outdata
 
 
+@lru_cache(maxsize=None)
+def _tractor_data_model(popcols=()):
+    """read_tractor's data model (tsdatamodel + Gaia columns, less `popcols`)."""
+    from desitarget.gaiamatch import gaiadatamodel
+    from desitarget.gaiamatch import pop_gaia_coords, pop_gaia_columns
+    gaiadatamodel = pop_gaia_coords(gaiadatamodel)
+    if len(popcols) > 0:
+        gaiadatamodel = pop_gaia_columns(gaiadatamodel, list(popcols))
+
+    return np.dtype(tsdatamodel.dtype.descr + gaiadatamodel.dtype.descr)
+
+
 def read_tractor(filename, header=False, columns=None):
     """Read a tractor catalogue or sweeps file.
 
@@ -150,29 +187,37 @@ def read_tractor(filename, header=False, columns=None):
     """
     check_fitsio_version()
 
+    # ADM the full data model including Gaia columns.
+    dmdtype = _tractor_data_model()
+
+    # ADM if no columns were requested, only read the columns that are
+    # ADM needed to populate the data model, not every column in the file.
+    readcols = columns
+    if columns is None:
+        with fitsio.FITS(filename) as fx:
+            filecols = [col.upper() for col in fx[1].get_colnames()]
+        dmcols = set(dmdtype.names)
+        dmcols.add("BRIGHTSTARINBLOB")
+        readcols = [col for col in filecols if col in dmcols]
+
     # ADM read in the file information. Due to fitsio header bugs
     # ADM near v1.0.0, make absolutely sure the user wants the header.
     if header:
-        indata, hdr = fitsio.read(filename, upper=True, header=True, columns=columns)
+        indata, hdr = fitsio.read(filename, upper=True, header=True, columns=readcols)
     else:
-        indata = fitsio.read(filename, upper=True, columns=columns)
-
-    # ADM the full data model including Gaia columns.
-    from desitarget.gaiamatch import gaiadatamodel
-    from desitarget.gaiamatch import pop_gaia_coords, pop_gaia_columns
-    gaiadatamodel = pop_gaia_coords(gaiadatamodel)
+        indata = fitsio.read(filename, upper=True, columns=readcols)
 
     # ADM special handling of the pre-DR7 Data Model.
-    for gaiacol in ['GAIA_PHOT_BP_RP_EXCESS_FACTOR',
-                    'GAIA_ASTROMETRIC_SIGMA5D_MAX',
-                    'GAIA_ASTROMETRIC_PARAMS_SOLVED', 'REF_CAT']:
-        if gaiacol not in indata.dtype.names:
-            gaiadatamodel = pop_gaia_columns(gaiadatamodel, [gaiacol])
-    dt = tsdatamodel.dtype.descr + gaiadatamodel.dtype.descr
-    dtnames = tsdatamodel.dtype.names + gaiadatamodel.dtype.names
+    popcols = tuple(gaiacol for gaiacol in
+                    ['GAIA_PHOT_BP_RP_EXCESS_FACTOR',
+                     'GAIA_ASTROMETRIC_SIGMA5D_MAX',
+                     'GAIA_ASTROMETRIC_PARAMS_SOLVED', 'REF_CAT']
+                    if gaiacol not in indata.dtype.names)
+    dmdtype = _tractor_data_model(popcols)
+    dt = dmdtype.descr
     # ADM limit to just passed columns.
     if columns is not None:
-        dt = [d for d, name in zip(dt, dtnames) if name in columns]
+        dt = [d for d, name in zip(dt, dmdtype.names) if name in columns]
 
     # ADM set-up the output array.
     nrows = len(indata)
@@ -182,8 +227,8 @@ def read_tractor(filename, header=False, columns=None):
         data['REF_ID'] = -1
 
     # ADM populate the common input/output columns.
-    for col in set(indata.dtype.names).intersection(set(data.dtype.names)):
-        data[col] = indata[col]
+    cols = [col for col in data.dtype.names if col in indata.dtype.names]
+    data[cols] = indata[cols]
 
     # ADM MASKBITS used to be BRIGHTSTARINBLOB which was set to True/False
     # ADM and which represented the SECOND bit of MASKBITS.
@@ -207,6 +252,54 @@ def read_tractor(filename, header=False, columns=None):
     return data
 
 
+def read_tractor_many(filenames, columns=None, numproc=4):
+    """Read, and concatenate, a list of tractor catalogues or sweeps files.
+
+    Parameters
+    ----------
+    filenames : :class:`list`
+        List of names of Tractor or sweeps files.
+    columns: :class:`list`, optional
+        Specify the desired Tractor catalog columns to read; passed
+        through to :func:`read_tractor`.
+    numproc : :class:`int`, optional, defaults to 4
+        The number of parallel processes to use.
+
+    Returns
+    -------
+    :class:`~numpy.ndarray`
+        Array with the tractor schema for all of the passed files, in
+        the order that the files were passed.
+
+    Notes
+    -----
+        - if numproc==1, use serial code instead of parallel.
+        - if no files are passed, an empty array with the (current)
+          tractor data model is returned.
+    """
+    # ADM if there are no files, there's nothing to concatenate.
+    if len(filenames) == 0:
+        dmdtype = _tractor_data_model()
+        dt = [d for d, name in zip(dmdtype.descr, dmdtype.names)
+              if columns is None or name in columns]
+        return add_photsys(np.zeros(0, dtype=dt))
+
+    def _read_tractor_file(filename):
+        """Read a single file (wrapper to pass columns)."""
+        return read_tractor(filename, columns=columns)
+
+    # ADM read the files in parallel...
+    if numproc > 1:
+        pool = sharedmem.MapReduce(np=numproc)
+        with pool:
+            data = pool.map(_read_tractor_file, filenames)
+    # ADM ...or in serial.
+    else:
+        data = [_read_tractor_file(fn) for fn in filenames]
+
+    return np.concatenate(data)
+
+
 def fix_tractor_dr1_dtype(objects):
     """DR1 tractor files have inconsistent dtype for the TYPE field.  Fix this.
 
@@ -247,25 +340,16 @@ def release_to_photsys(release):
     -----
     Flags an error if the system is not recognized.
     """
-    # ADM arrays of the key (RELEASE) and value (PHOTSYS) entries in the releasedict.
-    releasenums = np.array(list(releasedict.keys()))
-    photstrings = np.array(list(releasedict.values()))
-
     # ADM explicitly check no unknown release numbers were passed.
-    unknown = set(release) - set(releasenums)
-    if bool(unknown):
+    known = np.isin(release, _releasenums)
+    if not np.all(known):
+        unknown = set(np.atleast_1d(release)[~np.atleast_1d(known)])
         msg = 'Unknown release number {}'.format(unknown)
         log.critical(msg)
         raise ValueError(msg)
 
-    # ADM an array with indices running from 0 to the maximum release number + 1.
-    r2p = np.empty(np.max(releasenums)+1, dtype='|S1')
-
-    # ADM populate where the release numbers exist with the PHOTSYS.
-    r2p[releasenums] = photstrings
-
     # ADM return the PHOTSYS string that corresponds to each passed release number.
-    return r2p[release]
+    return _release_to_photsys[release]
 
 
 def write_targets(filename, data, indir=None, indir2=None, nchunks=None,
@@ -379,16 +463,14 @@ def write_targets(filename, data, indir=None, indir2=None, nchunks=None,
 
     # ADM add HEALPix column, if requested by input.
     if nside is not None:
-        theta, phi = np.radians(90-data["DEC"]), np.radians(data["RA"])
-        hppix = hp.ang2pix(nside, theta, phi, nest=True)
-        data = rfn.append_fields(data, 'HPXPIXEL', hppix, usemask=False)
+        data = _add_hpxpixel(data, nside)
         hdr['HPXNSIDE'] = nside
         hdr['HPXNEST'] = True
 
     # ADM populate SUBPRIORITY with a reproducible random float.
     if "SUBPRIORITY" in data.dtype.names:
-        np.random.seed(616)
-        data["SUBPRIORITY"] = np.random.random(ntargs)
+        rng = np.random.RandomState(616)
+        data["SUBPRIORITY"] = rng.random_sample(ntargs)
 
     # ADM add the type of survey (main, commissioning; or "cmx", sv) to the header.
     hdr["SURVEY"] = survey
@@ -420,6 +502,70 @@ def write_targets(filename, data, indir=None, indir2=None, nchunks=None,
     return ntargs, filename
 
 
+def _hpx_pixels(data, nside):
+    """(NESTED) HEALPixels at `nside` for an array with "RA", "DEC" columns."""
+    # ADM 90-DEC is already a new, contiguous array (rather than a strided
+    # ADM view of the structured array), so convert it to theta in place.
+    theta = 90. - data["DEC"]
+    np.radians(theta, out=theta)
+    phi = np.radians(data["RA"])
+
+    return hp.ang2pix(nside, theta, phi, nest=True)
+
+
+def _add_hpxpixel(data, nside):
+    """Return `data` with an HPXPIXEL column, at `nside`, appended."""
+    hppix = _hpx_pixels(data, nside)
+
+    # ADM build the dtype from the named fields only, as descr would
+    # ADM carry over any padding from non-packed (e.g. view) inputs.
+    dt = [(name, data.dtype[name]) for name in data.dtype.names]
+    dt += [('HPXPIXEL', hppix.dtype.str)]
+    outdata = np.empty(len(data), dtype=dt)
+    outdata[list(data.dtype.names)] = data
+    outdata['HPXPIXEL'] = hppix
+
+    return outdata
+
+
+def _cut_and_drop(data, ii, dropcols):
+    """Return `data[ii]` (`ii` is boolean) without the columns in `dropcols`."""
+    # ADM rfn.drop_fields rebuilds the array field-by-field (even if
+    # ADM there are no fields to drop). Instead, gather the selected rows
+    # ADM of a multi-field view of the kept columns straight into a
+    # ADM compact output array, in a single copy.
+    if len(dropcols) == 0:
+        return data[ii]
+    keep = [col for col in data.dtype.names if col not in dropcols]
+    rows = np.flatnonzero(ii)
+    outdata = np.empty(len(rows), dtype=[(col, data.dtype[col]) for col in keep])
+    np.take(data[keep], rows, out=outdata)
+
+    return outdata
+
+
+def _drstring(indir):
+    """The Data Release string (e.g. "dr8") from a Legacy Surveys directory.
+
+    Notes
+    -----
+        - Uses the last "drX" in `indir`. If there is no such string in
+          `indir`, then "dr?" is returned.
+    """
+    drs = _drre.findall(indir)
+    if len(drs) == 0:
+        return "dr?"
+
+    return "dr{}".format(drs[-1])
+
+
+@lru_cache(maxsize=32)
+def _brickre_with_prefix(prefix):
+    """Compiled regular expression to extract a brick name after `prefix`.
+    """
+    return re.compile(r"%s_(\d{4,5}[pm]\d{3,4})\.fits" % (prefix))
+
+
 def write_in_chunks(filename, data, nchunks, extname=None, header=None):
     """Write a FITS file in chunks to save memory.
 
@@ -516,13 +662,19 @@ def write_secondary(filename, data, primhdr=None, scxdir=None):
     # ADM populate SUBPRIORITY with a reproducible random float.
     if "SUBPRIORITY" in data.dtype.names:
         ntargs = len(data)
-        np.random.seed(616)
-        data["SUBPRIORITY"] = np.random.random(ntargs)
+        rng = np.random.RandomState(616)
+        data["SUBPRIORITY"] = rng.random_sample(ntargs)
 
     # ADM remove the SCND_TARGET_INIT column.
     scnd_target_init = data["SCND_TARGET_INIT"]
     data = rfn.drop_fields(data, ["SCND_TARGET_INIT"])
 
+    # ADM sort once on the original input order, so that each subset
+    # ADM of the sorted data, below, is also in the original input order.
+    order = np.argsort(data["SCND_ORDER"])
+    sorteddata = data[order]
+    sortedinit = scnd_target_init[order]
+
     # ADM write out the file of matches for every secondary bit.
     from desitarget.targetmask import scnd_mask
     for name in scnd_mask.names():
@@ -530,11 +682,9 @@ def write_secondary(filename, data, primhdr=None, scxdir=None):
         fn = "{}.fits".format(scnd_mask[name].filename)
         scxfile = os.path.join(scxdir, 'outdata', fn)
         # ADM retrieve just the data with this bit set.
-        ii = (scnd_target_init & scnd_mask[name]) != 0
-        # ADM to reorder to match the original input order.
-        order = np.argsort(data["SCND_ORDER"][ii])
+        ii = (sortedinit & scnd_mask[name]) != 0
         # ADM write to file.
-        fitsio.write(scxfile, data[ii][order],
+        fitsio.write(scxfile, sorteddata[ii],
                      extname='TARGETS', header=hdr, clobber=True)
 
     # ADM standalone secondary targets have RELEASE==0...
@@ -582,10 +732,7 @@ def write_skies(filename, data, indir=None, indir2=None, supp=False,
 
     if indir is not None:
         depend.setdep(hdr, 'input-data-release', indir)
-        # ADM note that if 'dr' is not in the indir DR
-        # ADM directory structure, garbage will
-        # ADM be rewritten gracefully in the header.
-        drstring = 'dr'+indir.split('dr')[-1][0]
+        drstring = _drstring(indir)
         depend.setdep(hdr, 'photcat', drstring)
     if indir2 is not None:
         depend.setdep(hdr, 'input-data-release-2', indir2)
@@ -603,9 +750,7 @@ def write_skies(filename, data, indir=None, indir2=None, supp=False,
 
     # ADM add HEALPix column, if requested by input.
     if nside is not None:
-        theta, phi = np.radians(90-data["DEC"]), np.radians(data["RA"])
-        hppix = hp.ang2pix(nside, theta, phi, nest=True)
-        data = rfn.append_fields(data, 'HPXPIXEL', hppix, usemask=False)
+        data = _add_hpxpixel(data, nside)
         hdr['HPXNSIDE'] = nside
         hdr['HPXNEST'] = True
 
@@ -613,10 +758,10 @@ def write_skies(filename, data, indir=None, indir2=None, supp=False,
     if "SUBPRIORITY" in data.dtype.names:
         # ADM ensure different SUBPRIORITIES for supp/standard files.
         if supp:
-            np.random.seed(626)
+            rng = np.random.RandomState(626)
         else:
-            np.random.seed(616)
-        data["SUBPRIORITY"] = np.random.random(nskies)
+            rng = np.random.RandomState(616)
+        data["SUBPRIORITY"] = rng.random_sample(nskies)
 
     fitsio.write(filename, data, extname='SKY_TARGETS', header=hdr, clobber=True)
 
@@ -653,10 +798,7 @@ def write_gfas(filename, data, indir=None, indir2=None, nside=None,
 
     if indir is not None:
         depend.setdep(hdr, 'input-data-release', indir)
-        # ADM note that if 'dr' is not in the indir DR
-        # ADM directory structure, garbage will
-        # ADM be rewritten gracefully in the header.
-        drstring = 'dr'+indir.split('dr')[-1][0]
+        drstring = _drstring(indir)
         depend.setdep(hdr, 'photcat', drstring)
     if indir2 is not None:
         depend.setdep(hdr, 'input-data-release-2', indir2)
@@ -668,9 +810,7 @@ def write_gfas(filename, data, indir=None, indir2=None, nside=None,
 
     # ADM add HEALPix column, if requested by input.
     if nside is not None:
-        theta, phi = np.radians(90-data["DEC"]), np.radians(data["RA"])
-        hppix = hp.ang2pix(nside, theta, phi, nest=True)
-        data = rfn.append_fields(data, 'HPXPIXEL', hppix, usemask=False)
+        data = _add_hpxpixel(data, nside)
         hdr['HPXNSIDE'] = nside
         hdr['HPXNEST'] = True
 
@@ -722,17 +862,12 @@ def write_randoms(filename, data, indir=None, hdr=None, nside=None, supp=False,
             depend.setdep(hdr, 'input-random-catalog', indir)
         else:
             depend.setdep(hdr, 'input-data-release', indir)
-            # ADM note that if 'dr' is not in the indir DR
-            # ADM directory structure, garbage will
-            # ADM be rewritten gracefully in the header.
-            drstring = 'dr'+indir.split('dr')[-1][0]
+            drstring = _drstring(indir)
             depend.setdep(hdr, 'photcat', drstring)
 
     # ADM add HEALPix column, if requested by input.
     if nside is not None:
-        theta, phi = np.radians(90-data["DEC"]), np.radians(data["RA"])
-        hppix = hp.ang2pix(nside, theta, phi, nest=True)
-        data = rfn.append_fields(data, 'HPXPIXEL', hppix, usemask=False)
+        data = _add_hpxpixel(data, nside)
         hdr['HPXNSIDE'] = nside
         hdr['HPXNEST'] = True
 
@@ -771,13 +906,16 @@ def iter_files(root, prefix, ext='fits'):
 def list_sweepfiles(root):
     """Return a list of sweep files found under `root` directory.
     """
+    # ADM only walk the directory structure once.
+    fns = list(iter_sweepfiles(root))
+
     # ADM check for duplicate files in case the listing was run
     # ADM at too low a level in the directory structure.
-    check = [os.path.basename(x) for x in iter_sweepfiles(root)]
+    check = [os.path.basename(x) for x in fns]
     if len(check) != len(set(check)):
         log.error("Duplicate sweep files in root directory!")
 
-    return [x for x in iter_sweepfiles(root)]
+    return fns
 
 
 def iter_sweepfiles(root):
@@ -793,9 +931,10 @@ def list_targetfiles(root):
     if os.path.isfile(root):
         return [root]
     allfns = glob(os.path.join(root, '*target*fits'))
-    fns, nfns = np.unique(allfns, return_counts=True)
-    if np.any(nfns > 1):
-        badfns = fns[nfns > 1]
+    # ADM a single hashing pass finds duplicates without sorting.
+    nfns = Counter(allfns)
+    badfns = [fn for fn in nfns if nfns[fn] > 1]
+    if len(badfns) > 0:
         msg = "Duplicate target files ({}) beneath root directory {}:".format(
             badfns, root)
         log.error(msg)
@@ -807,13 +946,16 @@ def list_targetfiles(root):
 def list_tractorfiles(root):
     """Return a list of tractor files found under `root` directory.
     """
+    # ADM only walk the directory structure once.
+    fns = list(iter_tractorfiles(root))
+
     # ADM check for duplicate files in case the listing was run
     # ADM at too low a level in the directory structure.
-    check = [os.path.basename(x) for x in iter_tractorfiles(root)]
+    check = [os.path.basename(x) for x in fns]
     if len(check) != len(set(check)):
         log.error("Duplicate Tractor files in root directory!")
 
-    return [x for x in iter_tractorfiles(root)]
+    return fns
 
 
 def iter_tractorfiles(root):
@@ -857,12 +999,7 @@ def brickname_from_filename(filename):
     """
     if not filename.endswith('.fits'):
         raise ValueError("Invalid tractor brick file: {}!".format(filename))
-    #
-    # Match filename tractor-0003p027.fits -> brickname 0003p027.
-    # Also match tractor-00003p0027.fits, just in case.
-    #
-    match = re.search(r"tractor-(\d{4,5}[pm]\d{3,4})\.fits",
-                      os.path.basename(filename))
+    match = _brickre.search(os.path.basename(filename))
 
     if match is None:
         raise ValueError("Invalid tractor brick file: {}!".format(filename))
@@ -895,8 +1032,7 @@ def brickname_from_filename_with_prefix(filename, prefix=''):
     # Match filename tractor-0003p027.fits -> brickname 0003p027.
     # Also match tractor-00003p0027.fits, just in case.
     #
-    match = re.search(r"%s_(\d{4,5}[pm]\d{3,4})\.fits" % (prefix),
-                      os.path.basename(filename))
+    match = _brickre_with_prefix(prefix).search(os.path.basename(filename))
 
     if match is None:
         raise ValueError("Invalid galaxia mock brick file: {}!".format(filename))
@@ -1045,9 +1181,24 @@ def load_pixweight_recarray(inmapfile, nside, pixmap=None):
     nrows = hp.nside2npix(nside)
     outdata = np.zeros(nrows, dtype=pixmap.dtype)
 
-    # ADM resample the map for each column.
+    # ADM resample the map for each column. In the NESTED scheme,
+    # ADM upgrading just repeats each pixel and downgrading is the
+    # ADM mean over contiguous blocks of pixels. So, hp.ud_grade is
+    # ADM only needed to handle bad (UNSEEN/non-finite) pixels, or the
+    # ADM rounding of integer columns, when downgrading.
     for col in pixmap.dtype.names:
-        outdata[col] = hp.pixelfunc.ud_grade(pixmap[col], nside, order_in='NESTED', order_out='NESTED')
+        # ADM the HEALPixel number is recalculated below.
+        if col == 'HPXPIXEL':
+            continue
+        m = pixmap[col]
+        if nrows > npix:
+            outdata[col] = np.repeat(m, nrows//npix)
+        elif nrows == npix:
+            outdata[col] = m
+        elif m.dtype.kind == 'f' and not np.any(hp.mask_bad(m) | ~np.isfinite(m)):
+            outdata[col] = np.sum(m.reshape(nrows, -1), axis=1) / (npix//nrows)
+        else:
+            outdata[col] = hp.pixelfunc.ud_grade(m, nside, order_in='NESTED', order_out='NESTED')
 
     # ADM if one column was the HEALPixel number, recalculate for the new resolution.
     if 'HPXPIXEL' in pixmap.dtype.names:
@@ -1056,19 +1207,19 @@ def load_pixweight_recarray(inmapfile, nside, pixmap=None):
     return outdata
 
 
+@lru_cache(maxsize=None)
 def gitversion():
     """Returns `git describe --tags --dirty --always`,
-    or 'unknown' if not a git repo"""
-    import os
+    or 'unknown' if not a git repo
+
+    The result is cached, so git is only run once per process."""
     from subprocess import Popen, PIPE, STDOUT
-    origdir = os.getcwd()
-    os.chdir(os.path.dirname(__file__))
     try:
-        p = Popen(['git', "describe", "--tags", "--dirty", "--always"], stdout=PIPE, stderr=STDOUT)
+        p = Popen(['git', "describe", "--tags", "--dirty", "--always"],
+                  stdout=PIPE, stderr=STDOUT, cwd=os.path.dirname(__file__))
     except EnvironmentError:
         return 'unknown'
 
-    os.chdir(origdir)
     out = p.communicate()[0]
     if p.returncode == 0:
         # - avoid py3 bytes and py3 unicode; get native str in both cases
@@ -1198,12 +1349,32 @@ def check_hp_target_dir(hpdirname):
         - Checks that all files are at the same NSIDE.
         - Checks that no two files contain the same HEALPixels.
         - Checks that HEALPixel numbers are consistent with NSIDE.
+        - Results are cached for each directory until any file in it is
+          added, removed or changes size or modification time. Use
+          :func:`_clear_hp_target_dir_cache` to clear the cache.
     """
-    # ADM glob all the files in the directory, read the pixel
-    # ADM numbers and NSIDEs.
+    # ADM glob all the files in the directory. The file names keep the
+    # ADM form (e.g. relative or absolute) of the passed hpdirname.
+    fns = sorted(glob(os.path.join(hpdirname, "*fits")))
+
+    # ADM if no file has changed since the directory was last checked,
+    # ADM return the cached results rather than re-reading headers. The
+    # ADM cache is keyed on the absolute path and stores file basenames,
+    # ADM so it's shared by every form of the passed hpdirname.
+    cachekey = os.path.abspath(hpdirname)
+    filestate = []
+    for fn in fns:
+        st = os.stat(fn)
+        filestate.append((os.path.basename(fn), st.st_size, st.st_mtime_ns))
+    if cachekey in _hp_target_dir_cache:
+        cachedstate, nside, pixbase = _hp_target_dir_cache[cachekey]
+        if cachedstate == filestate:
+            return nside, {pix: os.path.join(hpdirname, base)
+                           for pix, base in pixbase.items()}
+
+    # ADM read the pixel numbers and NSIDEs.
     nside = []
     pixlist = []
-    fns = glob(os.path.join(hpdirname, "*fits"))
     pixdict = {}
     for fn in fns:
         hdr = fitsio.read_header(fn, "TARGETS")
@@ -1215,8 +1386,7 @@ def check_hp_target_dir(hpdirname):
         # ADM check we haven't stored a pixel string that is too long.
         _check_hpx_length(pixels)
         # ADM create a look-up dictionary of file-for-each-pixel.
-        for pix in pixels:
-            pixdict[pix] = fn
+        pixdict.update(dict.fromkeys(pixels, fn))
         pixlist.append(pixels)
     nside = np.array(nside)
     # ADM as well as having just an array of all the pixels.
@@ -1229,14 +1399,15 @@ def check_hp_target_dir(hpdirname):
             .format(hpdirname)
 
     # ADM check that no two files contain the same HEALPixels.
-    if not len(set(pixlist)) == len(pixlist):
-        dup = set([pix for pix in pixlist if list(pixlist).count(pix) > 1])
+    pixnums, pixcnts = np.unique(pixlist, return_counts=True)
+    if np.any(pixcnts > 1):
+        dup = set(pixnums[pixcnts > 1])
         msg = 'Duplicate pixel ({}) in files in {}'           \
             .format(dup, hpdirname)
 
     # ADM check that the pixels are consistent with the nside.
-    goodpix = np.arange(hp.nside2npix(nside[0]))
-    badpix = set(pixlist) - set(goodpix)
+    npix = hp.nside2npix(nside[0])
+    badpix = set(pixnums[(pixnums < 0) | (pixnums >= npix)])
     if len(badpix) > 0:
         msg = 'Pixel ({}) not allowed at NSIDE={} in {}'.     \
               format(badpix, nside[0], hpdirname)
@@ -1245,9 +1416,17 @@ def check_hp_target_dir(hpdirname):
         log.critical(msg)
         raise AssertionError(msg)
 
+    pixbase = {pix: os.path.basename(fn) for pix, fn in pixdict.items()}
+    _hp_target_dir_cache[cachekey] = filestate, nside[0], pixbase
+
     return nside[0], pixdict
 
 
+def _clear_hp_target_dir_cache():
+    """Clear the cached results of :func:`check_hp_target_dir`."""
+    _hp_target_dir_cache.clear()
+
+
 def read_targets_in_hp(hpdirname, nside, pixlist, columns=None,
                        header=False):
     """Read in targets in a set of HEALPixels.
@@ -1299,36 +1478,57 @@ def read_targets_in_hp(hpdirname, nside, pixlist, columns=None,
         # ADM check, and grab information from, the target directory.
         filenside, filedict = check_hp_target_dir(hpdirname)
 
-        # ADM read in the first file to grab the data model for
-        # ADM cases where we find no targets in the box.
-        fn0 = list(filedict.values())[0]
-        notargs, nohdr = fitsio.read(fn0, 'TARGETS',
-                                     columns=columnscopy, header=True)
-        notargs = np.zeros(0, dtype=notargs.dtype)
-
         # ADM change the passed pixels to the nside of the file schema.
         filepixlist = nside2nside(nside, filenside, pixlist)
 
         # ADM only consider pixels for which we have a file.
-        isindict = [pix in filedict for pix in filepixlist]
+        isindict = np.isin(filepixlist, list(filedict))
         filepixlist = filepixlist[isindict]
 
         # ADM make sure each file is only read once.
         infiles = set([filedict[pix] for pix in filepixlist])
 
-        # ADM read in the files and concatenate the resulting targets.
-        targets = []
-        for infile in infiles:
-            targs, hdr = fitsio.read(infile, 'TARGETS',
-                                     columns=columnscopy, header=True)
-            targets.append(targs)
-        # ADM if targets is empty, return no targets.
-        if len(targets) == 0:
+        # ADM if there are no files to read, return no targets. Read
+        # ADM in the first file to grab the data model for this case.
+        if len(infiles) == 0:
+            fn0 = list(filedict.values())[0]
+            notargs, nohdr = fitsio.read(fn0, 'TARGETS',
+                                         columns=columnscopy, header=True)
+            notargs = np.zeros(0, dtype=notargs.dtype)
             if header:
                 return notargs, nohdr
             else:
                 return notargs
-        targets = np.concatenate(targets)
+
+        # ADM if only one file is needed, just read it in...
+        if len(infiles) == 1:
+            targets, hdr = fitsio.read(infiles.pop(), 'TARGETS',
+                                       columns=columnscopy, header=True)
+        # ADM ...otherwise read the files straight into a pre-allocated
+        # ADM output array, rather than concatenating a list of arrays,
+        # ADM which would hold two copies of the targets in memory.
+        # ADM the output data model is set by the first file read.
+        else:
+            nrows = []
+            for infile in infiles:
+                with fitsio.FITS(infile) as fx:
+                    nrows.append(fx['TARGETS'].get_nrows())
+            targets = None
+            start = 0
+            for infile, nrow in zip(infiles, nrows):
+                targs, hdr = fitsio.read(infile, 'TARGETS',
+                                         columns=columnscopy, header=True)
+                if targets is None:
+                    targets = np.empty(np.sum(nrows), dtype=targs.dtype)
+                # ADM structured assignment is positional, so guard against
+                # ADM files with a different data model from the first file.
+                if targs.dtype != targets.dtype:
+                    msg = 'Data model of {} ({}) differs from other files ({})' \
+                        .format(infile, targs.dtype, targets.dtype)
+                    log.critical(msg)
+                    raise ValueError(msg)
+                targets[start:start+nrow] = targs
+                start += nrow
     # ADM ...otherwise just read in the targets.
     else:
         targets, hdr = fitsio.read(hpdirname, 'TARGETS',
@@ -1337,7 +1537,7 @@ def read_targets_in_hp(hpdirname, nside, pixlist, columns=None,
     # ADM restrict the targets to the actual requested HEALPixels...
     ii = is_in_hp(targets, nside, pixlist)
     # ADM ...and remove RA/Dec columns if we added them.
-    targets = rfn.drop_fields(targets[ii], addedcols)
+    targets = _cut_and_drop(targets, ii, addedcols)
 
     if header:
         return targets, hdr
@@ -1405,7 +1605,7 @@ def read_targets_in_box(hpdirname, radecbox=[0., 360., -90., 90.],
     # ADM restrict only to targets in the requested RA/Dec box...
     ii = is_in_box(targets, radecbox)
     # ADM ...and remove RA/Dec columns if we added them.
-    targets = rfn.drop_fields(targets[ii], addedcols)
+    targets = _cut_and_drop(targets, ii, addedcols)
 
     if header:
         return targets, hdr
@@ -1462,7 +1662,7 @@ def read_targets_in_cap(hpdirname, radecrad, columns=None):
     # ADM restrict only to targets in the requested cap...
     ii = is_in_cap(targets, radecrad)
     # ADM ...and remove RA/Dec columns if we added them.
-    targets = rfn.drop_fields(targets[ii], addedcols)
+    targets = _cut_and_drop(targets, ii, addedcols)
 
     return targets
 
@@ -6,6 +6,7 @@ Presumably this defines targets.
 """
 import numpy as np
 import healpy as hp
+from functools import lru_cache
 import numpy.lib.recfunctions as rfn
 
 from astropy.table import Table
@@ -52,6 +53,15 @@ SURVEY_MAX = ENCODE_MTL_SURVEY_MASK >> SOURCE_END  # 15
 
 TARGETID_SURVEY_INDEX = {'desi': 0, 'bgs': 1, 'mws': 2}
 
+# ADM the (bit number, bit mask) used to decode each component of the
+# ADM TARGETID, in the order in which decode_targetid returns them.
+_targetid_fields = [(targetid_mask[name].bitnum, 2**targetid_mask[name].nbits - 1)
+                    for name in ["OBJID", "BRICKID", "RELEASE", "MOCK", "SKY"]]
+
+# ADM the (mutually exclusive) observational states of a target, in the
+# ADM order used to index the per-bit priorities in calc_priority.
+PRIORITY_STATES = ['UNOBS', 'DONE', 'MORE_ZGOOD', 'MORE_ZWARN']
+
 
 def target_bitmask_to_string(target_class, mask):
     """Converts integer values of target bitmasks to strings.
@@ -59,15 +69,18 @@ def target_bitmask_to_string(target_class, mask):
     Where multiple bits are set, joins the names of each contributing bit with
     '+'.
     """
-    target_class_names = np.zeros(len(target_class), dtype=np.object)
-    unique_target_classes = np.unique(target_class)
-    for tc in unique_target_classes:
+    # ADM find each unique class and where it appears in a single pass.
+    unique_target_classes, inverse, counts = np.unique(
+        target_class, return_inverse=True, return_counts=True)
+    tc_names = np.zeros(len(unique_target_classes), dtype=object)
+    for i, (tc, count) in enumerate(zip(unique_target_classes, counts)):
         # tc is the encoded integer value of the target bitmask
-        has_this_target_class = np.where(target_class == tc)[0]
-
         tc_name = '+'.join(mask.names(tc))
-        target_class_names[has_this_target_class] = tc_name
-        log.info('Target class %s (%d): %d' % (tc_name, tc, len(has_this_target_class)))
+        tc_names[i] = tc_name
+        log.info('Target class %s (%d): %d' % (tc_name, tc, count))
+
+    # ADM broadcast the name of each unique class back to every target.
+    target_class_names = tc_names[inverse]
 
     return target_class_names
 
@@ -92,7 +105,8 @@ def encode_mtl_targetid(targets):
     mws_target = targets['MWS_TARGET'] != 0
 
     # Assumes surveys are mutually exclusive.
-    assert(np.max(np.sum([desi_target, bgs_target, mws_target], axis=0)) == 1)
+    assert(not np.any((desi_target & bgs_target) | (desi_target & mws_target) |
+                      (bgs_target & mws_target)))
 
     # Set the survey bits
     # encoded_targetid[desi_target] += TARGETID_SURVEY_INDEX['desi'] << SOURCE_END
@@ -123,8 +137,10 @@ def encode_mtl_targetid(targets):
         assert(mws_mask[name] <= SOURCE_MAX)
         encoded_targetid[ii] += encode_survey_source(0, mws_mask[name], 0)
 
-    # FIXME (APC): expensive...
-    assert(len(np.unique(encoded_targetid)) == len(encoded_targetid))
+    # ADM check the encoded TARGETIDs are unique. Comparing neighbours in
+    # ADM a sorted copy avoids np.unique's extra mask and output arrays.
+    sortedid = np.sort(encoded_targetid)
+    assert(not np.any(sortedid[1:] == sortedid[:-1]))
     return encoded_targetid
 
 
@@ -183,55 +199,24 @@ def encode_targetid(objid=None, brickid=None, release=None, mock=None, sky=None)
         nobjs = len(inputs[firstgoodpar])
         intpassed = False
 
-    # ADM set parameters that weren't passed to zerod arrays
-    # ADM set integers that were passed to at least 1D arrays
-    if objid is None:
-        objid = np.zeros(nobjs, dtype='int64')
-    else:
-        objid = np.atleast_1d(objid)
-    if brickid is None:
-        brickid = np.zeros(nobjs, dtype='int64')
-    else:
-        brickid = np.atleast_1d(brickid)
-    if release is None:
-        release = np.zeros(nobjs, dtype='int64')
-    else:
-        release = np.atleast_1d(release)
-    if mock is None:
-        mock = np.zeros(nobjs, dtype='int64')
-    else:
-        mock = np.atleast_1d(mock)
-    if sky is None:
-        sky = np.zeros(nobjs, dtype='int64')
-    else:
-        sky = np.atleast_1d(sky)
-
-    # ADM check none of the passed parameters exceed their bit-allowance
-    if not np.all(objid <= 2**targetid_mask.OBJID.nbits):
-        log.error('Invalid range when creating targetid: OBJID cannot exceed {}'
-                  .format(2**targetid_mask.OBJID.nbits))
-    if not np.all(brickid <= 2**targetid_mask.BRICKID.nbits):
-        log.error('Invalid range when creating targetid: BRICKID cannot exceed {}'
-                  .format(2**targetid_mask.BRICKID.nbits))
-    if not np.all(release <= 2**targetid_mask.RELEASE.nbits):
-        log.error('Invalid range when creating targetid: RELEASE cannot exceed {}'
-                  .format(2**targetid_mask.RELEASE.nbits))
-    if not np.all(mock <= 2**targetid_mask.MOCK.nbits):
-        log.error('Invalid range when creating targetid: MOCK cannot exceed {}'
-                  .format(2**targetid_mask.MOCK.nbits))
-    if not np.all(sky <= 2**targetid_mask.SKY.nbits):
-        log.error('Invalid range when creating targetid: SKY cannot exceed {}'
-                  .format(2**targetid_mask.SKY.nbits))
-
     # ADM set up targetid as an array of 64-bit integers
     targetid = np.zeros(nobjs, ('int64'))
+
     # ADM populate TARGETID based on the passed columns and desitarget.targetid_mask
-    # ADM remember to shift to type integer 64 to avoid casting
-    targetid |= objid.astype('int64') << targetid_mask.OBJID.bitnum
-    targetid |= brickid.astype('int64') << targetid_mask.BRICKID.bitnum
-    targetid |= release.astype('int64') << targetid_mask.RELEASE.bitnum
-    targetid |= mock.astype('int64') << targetid_mask.MOCK.bitnum
-    targetid |= sky.astype('int64') << targetid_mask.SKY.bitnum
+    # ADM parameters that weren't passed are zero, so they needn't be added.
+    names = ["OBJID", "BRICKID", "RELEASE", "SKY", "MOCK"]
+    for name, value in zip(names, inputs):
+        if value is None:
+            continue
+        # ADM set integers that were passed to at least 1D arrays
+        value = np.atleast_1d(value)
+        # ADM check the passed parameter doesn't exceed its bit-allowance
+        maxval = 2**targetid_mask[name].nbits
+        if not np.all(value <= maxval):
+            log.error('Invalid range when creating targetid: {} cannot exceed {}'
+                      .format(name, maxval))
+        # ADM remember to shift to type integer 64 to avoid casting
+        targetid |= value.astype('int64') << targetid_mask[name].bitnum
 
     # ADM if the main inputs were integers, return an integer
     if intpassed:
@@ -269,18 +254,10 @@ def decode_targetid(targetid):
         - see also https://desi.lbl.gov/DocDB/cgi-bin/private/RetrieveFile?docid=2348
     """
 
-    # ADM retrieve each constituent value by left-shifting by the number of bits that comprise
-    # ADM the value, to the left-end of the value, and then right-shifting to the right-end
-    objid = (targetid & (2**targetid_mask.OBJID.nbits - 1
-                         << targetid_mask.OBJID.bitnum)) >> targetid_mask.OBJID.bitnum
-    brickid = (targetid & (2**targetid_mask.BRICKID.nbits - 1
-                           << targetid_mask.BRICKID.bitnum)) >> targetid_mask.BRICKID.bitnum
-    release = (targetid & (2**targetid_mask.RELEASE.nbits - 1
-                           << targetid_mask.RELEASE.bitnum)) >> targetid_mask.RELEASE.bitnum
-    mock = (targetid & (2**targetid_mask.MOCK.nbits - 1
-                        << targetid_mask.MOCK.bitnum)) >> targetid_mask.MOCK.bitnum
-    sky = (targetid & (2**targetid_mask.SKY.nbits - 1
-                       << targetid_mask.SKY.bitnum)) >> targetid_mask.SKY.bitnum
+    # ADM retrieve each constituent value by right-shifting the value to
+    # ADM the right-end and then masking off the bits that comprise it.
+    objid, brickid, release, mock, sky = [
+        (targetid >> bitnum) & bitmask for bitnum, bitmask in _targetid_fields]
 
     return objid, brickid, release, mock, sky
 
@@ -364,6 +341,37 @@ def main_cmx_or_sv(targets, rename=False, scnd=False):
     return outcolnames, masks, survey
 
 
+def _native_column(column):
+    """A contiguous, native-byte-order version of a target column.
+
+    Bit tests on a column of a wide (and, from FITS, big-endian)
+    structured array are several times slower than on a contiguous
+    native array, so it's worth converting columns that are tested
+    many times. No copy is made if `column` is already suitable.
+    """
+    column = np.asarray(column)
+    return np.ascontiguousarray(column, dtype=column.dtype.newbyteorder('='))
+
+
+@lru_cache(maxsize=None)
+def _bit_obsconditions(mask):
+    """The OBSCONDITIONS bitmask for each bit name in a target mask.
+
+    Parameters
+    ----------
+    mask : :class:`~desiutil.bitmask.BitMask`
+        A target mask, e.g. `desi_mask`.
+
+    Returns
+    -------
+    :class:`dict`
+        The OBSCONDITIONS bitmask (value) for each bit name (key) in
+        `mask`.
+    """
+    return {name: obsconditions.mask(mask[name].obsconditions)
+            for name in mask.names()}
+
+
 def set_obsconditions(targets):
     """set the OBSCONDITIONS mask for each target bit.
 
@@ -390,12 +398,17 @@ def set_obsconditions(targets):
     n = len(targets)
     obscon = np.zeros(n, dtype='i4')
     for mask, xxx_target in zip(masks, colnames):
-        for name in mask.names():
-            # ADM which targets have this bit for this mask set?
-            ii = (targets[xxx_target] & mask[name]) != 0
-            # ADM under what conditions can that bit be observed?
+        targetcol = _native_column(targets[xxx_target])
+        # ADM under what conditions can each bit be observed? Group
+        # ADM the bits that share OBSCONDITIONS, to test them together.
+        obsbits = {}
+        for name, bitobscon in _bit_obsconditions(mask).items():
+            obsbits[bitobscon] = obsbits.get(bitobscon, 0) | mask[name]
+        for bitobscon, bits in obsbits.items():
+            # ADM which targets have any of these bits for this mask set?
+            ii = (targetcol & bits) != 0
             if np.any(ii):
-                obscon[ii] |= obsconditions.mask(mask[name].obsconditions)
+                obscon[ii] |= bitobscon
 
     return obscon
 
@@ -433,49 +446,72 @@ def initial_priority_numobs(targets,
         - the input obscon string can be converted to a bitmask using
           `desitarget.targetmask.obsconditions.mask(blat)`.
     """
+    return _initial_priority_numobs(targets, [obscon])[0]
+
+
+def _initial_priority_numobs(targets, obscons):
+    """:func:`initial_priority_numobs` for several `obscon` at once.
+
+    Parameters
+    ----------
+    targets : :class:`~numpy.ndarray`
+        As for :func:`initial_priority_numobs`.
+    obscons : :class:`list`
+        A list of `obscon` strings, as for :func:`initial_priority_numobs`.
+
+    Returns
+    -------
+    :class:`list`
+        The (priority, numobs) tuple returned by
+        :func:`initial_priority_numobs` for each entry in `obscons`.
+
+    Notes
+    -----
+        - Each target column is only prepared, and each bit only tested,
+          once, no matter how many `obscons` are passed.
+    """
     colnames, masks, _ = main_cmx_or_sv(targets)
 
     # ADM set up the output arrays.
-    outpriority = np.zeros(len(targets), dtype='int')
+    outpriorities = [np.zeros(len(targets), dtype='int') for oc in obscons]
     # ADM remember that calibs have NUMOBS of -1.
-    outnumobs = np.zeros(len(targets), dtype='int')-1
+    outnumobses = [np.zeros(len(targets), dtype='int')-1 for oc in obscons]
 
-    # ADM convert the passed obscon string to bits.
-    obsbits = obsconditions.mask(obscon)
+    # ADM convert the passed obscon strings to bits.
+    obsbitses = [obsconditions.mask(oc) for oc in obscons]
 
     # ADM loop through the masks to establish all bitnames of interest.
     for colname, mask in zip(colnames, masks):
-        # ADM first determine which bits actually have priorities.
-        bitnames = []
+        # ADM the bits that are set for at least one target. There's
+        # ADM no need to consider bits that are never set.
+        targetcol = _native_column(targets[colname])
+        anyset = np.bitwise_or.reduce(targetcol)
+        bitobscon = _bit_obsconditions(mask)
         for name in mask.names():
+            if (anyset & mask[name]) == 0:
+                continue
+            # ADM only consider bits that have priorities...
             try:
-                _ = mask[name].priorities["UNOBS"]
-                # ADM also only consider bits with correct OBSCONDITIONS.
-                obsforname = obsconditions.mask(mask[name].obsconditions)
-                if (obsforname & obsbits) != 0:
-                    bitnames.append(name)
+                priority = mask[name].priorities['UNOBS']
             except KeyError:
-                pass
-
-        # ADM loop through the relevant bits updating with the highest
-        # ADM priority and the largest value of NUMOBS.
-        for name in bitnames:
+                continue
+            # ADM ...and the correct OBSCONDITIONS.
+            which = [i for i, obsbits in enumerate(obsbitses)
+                     if (bitobscon[name] & obsbits) != 0]
+            if len(which) == 0:
+                continue
             # ADM indexes in the DESI/MWS/BGS_TARGET column that have this bit set
-            istarget = (targets[colname] & mask[name]) != 0
-            # ADM for each index, determine where this bit is set and the priority
-            # ADM for this bit is > than the currently stored priority.
-            w = np.where((mask[name].priorities['UNOBS'] >= outpriority) & istarget)[0]
-            # ADM where a larger priority trumps the stored priority, update the priority
-            if len(w) > 0:
-                outpriority[w] = mask[name].priorities['UNOBS']
-            # ADM for each index, determine where this bit is set and whether NUMOBS
-            # ADM for this bit is > than the currently stored NUMOBS.
-            w = np.where((mask[name].numobs >= outnumobs) & istarget)[0]
-            # ADM where a larger NUMOBS trumps the stored NUMOBS, update NUMOBS.
-            if len(w) > 0:
-                outnumobs[w] = mask[name].numobs
-
-    return outpriority, outnumobs
+            istarget = (targetcol & mask[name]) != 0
+            numobs = mask[name].numobs
+            for i in which:
+                # ADM where this bit is set and its priority is larger than
+                # ADM the stored priority, update the priority...
+                outpriority, outnumobs = outpriorities[i], outnumobses[i]
+                outpriority[(priority >= outpriority) & istarget] = priority
+                # ADM ...and similarly for NUMOBS.
+                outnumobs[(numobs >= outnumobs) & istarget] = numobs
+
+    return list(zip(outpriorities, outnumobses))
 
 
 def encode_survey_source(survey, source, original_targetid):
@@ -499,6 +535,37 @@ def decode_survey_source(encoded_values):
     return survey, source, original_targetid
 
 
+def _max_priority(priority, state, targetcol, mask, names):
+    """Update `priority` in place with the highest priority for some bits.
+
+    Parameters
+    ----------
+    priority : :class:`~numpy.ndarray`
+        Integer array of priorities, which is updated in place.
+    state : :class:`~numpy.ndarray`
+        Integer array of indexes into `PRIORITY_STATES`, i.e. the
+        observational state of each target.
+    targetcol : :class:`~numpy.ndarray`
+        The target bitmask column (e.g. `DESI_TARGET`) for each target,
+        as returned by :func:`_native_column`.
+    mask : :class:`~desiutil.bitmask.BitMask`
+        The mask corresponding to `targetcol`.
+    names : :class:`list`
+        The names of the bits in `mask` to consider.
+    """
+    # ADM group the bits that share the same priority for every
+    # ADM observational state, so each group only needs one pass.
+    bitgroups = {}
+    for name in names:
+        prios = tuple(mask[name].priorities[s] for s in PRIORITY_STATES)
+        bitgroups[prios] = bitgroups.get(prios, 0) | mask[name]
+
+    for prios, bits in bitgroups.items():
+        ii = (targetcol & bits) != 0
+        # ADM look up the priority of each target's observational state.
+        np.maximum(priority, np.array(prios)[state], out=priority, where=ii)
+
+
 def calc_priority(targets, zcat):
     """
     Calculate target priorities from masks, observation/redshift status.
@@ -567,6 +634,13 @@ def calc_priority(targets, zcat):
     assert not np.any(zwarn & done)
     assert np.all(unobs | done | zgood | zwarn)
 
+    # ADM pack the observational states into a single index into
+    # ADM PRIORITY_STATES (UNOBS is 0).
+    state = np.zeros(len(targets), dtype='i1')
+    state[done] = 1
+    state[zgood] = 2
+    state[zwarn] = 3
+
     # DESI dark time targets.
     if survey != 'cmx':
         if desi_target in targets.dtype.names:
@@ -575,40 +649,35 @@ def calc_priority(targets, zcat):
             names = ('ELG', 'LRG_1PASS', 'LRG_2PASS')
             if survey[0:2] == 'sv':
                 names = ('ELG', 'LRG')
-            for name in names:
-                ii = (targets[desi_target] & desi_mask[name]) != 0
-                priority[ii & unobs] = np.maximum(priority[ii & unobs], desi_mask[name].priorities['UNOBS'])
-                priority[ii & done] = np.maximum(priority[ii & done],  desi_mask[name].priorities['DONE'])
-                priority[ii & zgood] = np.maximum(priority[ii & zgood], desi_mask[name].priorities['MORE_ZGOOD'])
-                priority[ii & zwarn] = np.maximum(priority[ii & zwarn], desi_mask[name].priorities['MORE_ZWARN'])
+            desicol = _native_column(targets[desi_target])
+            _max_priority(priority, state, desicol,
+                          desi_mask, names)
 
             # QSO could be Lyman-alpha or Tracer.
             name = 'QSO'
-            ii = (targets[desi_target] & desi_mask[name]) != 0
+            ii = (desicol & desi_mask[name]) != 0
             good_hiz = zgood & (zcat['Z'] >= 2.15) & (zcat['ZWARN'] == 0)
-            priority[ii & unobs] = np.maximum(priority[ii & unobs], desi_mask[name].priorities['UNOBS'])
-            priority[ii & done] = np.maximum(priority[ii & done], desi_mask[name].priorities['DONE'])
-            priority[ii & good_hiz] = np.maximum(priority[ii & good_hiz], desi_mask[name].priorities['MORE_ZGOOD'])
-            priority[ii & ~good_hiz] = np.maximum(priority[ii & ~good_hiz], desi_mask[name].priorities['DONE'])
-            priority[ii & zwarn] = np.maximum(priority[ii & zwarn], desi_mask[name].priorities['MORE_ZWARN'])
+            # ADM only good high-z QSOs get the MORE_ZGOOD priority, so
+            # ADM treat other zgood QSOs as an extra (fifth) state...
+            qsostate = state.copy()
+            qsostate[zgood & ~good_hiz] = len(PRIORITY_STATES)
+            # ADM ...and every QSO that isn't a good high-z QSO gets at
+            # ADM least the DONE priority.
+            prios = desi_mask[name].priorities
+            qsoprios = np.array([prios[s] for s in PRIORITY_STATES] + [prios['DONE']])
+            nothiz = np.arange(len(qsoprios)) != PRIORITY_STATES.index('MORE_ZGOOD')
+            qsoprios[nothiz] = np.maximum(qsoprios[nothiz], prios['DONE'])
+            np.maximum(priority, qsoprios[qsostate], out=priority, where=ii)
 
         # BGS targets.
         if bgs_target in targets.dtype.names:
-            for name in bgs_mask.names():
-                ii = (targets[bgs_target] & bgs_mask[name]) != 0
-                priority[ii & unobs] = np.maximum(priority[ii & unobs], bgs_mask[name].priorities['UNOBS'])
-                priority[ii & done] = np.maximum(priority[ii & done],  bgs_mask[name].priorities['DONE'])
-                priority[ii & zgood] = np.maximum(priority[ii & zgood], bgs_mask[name].priorities['MORE_ZGOOD'])
-                priority[ii & zwarn] = np.maximum(priority[ii & zwarn], bgs_mask[name].priorities['MORE_ZWARN'])
+            targetcol = _native_column(targets[bgs_target])
+            _max_priority(priority, state, targetcol, bgs_mask, bgs_mask.names())
 
         # MWS targets.
         if mws_target in targets.dtype.names:
-            for name in mws_mask.names():
-                ii = (targets[mws_target] & mws_mask[name]) != 0
-                priority[ii & unobs] = np.maximum(priority[ii & unobs], mws_mask[name].priorities['UNOBS'])
-                priority[ii & done] = np.maximum(priority[ii & done],  mws_mask[name].priorities['DONE'])
-                priority[ii & zgood] = np.maximum(priority[ii & zgood], mws_mask[name].priorities['MORE_ZGOOD'])
-                priority[ii & zwarn] = np.maximum(priority[ii & zwarn], mws_mask[name].priorities['MORE_ZWARN'])
+            targetcol = _native_column(targets[mws_target])
+            _max_priority(priority, state, targetcol, mws_mask, mws_mask.names())
 
         # Special case: IN_BRIGHT_OBJECT means priority=-1 no matter what
         ii = (targets[desi_target] & desi_mask.IN_BRIGHT_OBJECT) != 0
@@ -616,12 +685,9 @@ def calc_priority(targets, zcat):
 
     # ADM Special case: SV-like commissioning targets.
     if 'CMX_TARGET' in targets.dtype.names:
-        for name in ['SV0_' + label for label in ('BGS', 'MWS')]:
-            ii = (targets['CMX_TARGET'] & cmx_mask[name]) != 0
-            priority[ii & unobs] = np.maximum(priority[ii & unobs], cmx_mask[name].priorities['UNOBS'])
-            priority[ii & done] = np.maximum(priority[ii & done],  cmx_mask[name].priorities['DONE'])
-            priority[ii & zgood] = np.maximum(priority[ii & zgood], cmx_mask[name].priorities['MORE_ZGOOD'])
-            priority[ii & zwarn] = np.maximum(priority[ii & zwarn], cmx_mask[name].priorities['MORE_ZWARN'])
+        names = ['SV0_' + label for label in ('BGS', 'MWS')]
+        targetcol = _native_column(targets['CMX_TARGET'])
+        _max_priority(priority, state, targetcol, cmx_mask, names)
 
     return priority
 
@@ -697,16 +763,29 @@ def calc_numobs(targets):
         # This forces the calculation of nmore in targets.calc_priority (and
         # ztargets['NOBS_MORE'] in mtl.make_mtl) to give nmore = 1 regardless
         # of targets['NUMOBS']
-        ii = (targets['BGS_TARGET'] & bgs_mask.BGS_FAINT) != 0
-        nobs[ii] = targets['NUMOBS'][ii]+1
-        ii = (targets['BGS_TARGET'] & bgs_mask.BGS_BRIGHT) != 0
-        nobs[ii] = targets['NUMOBS'][ii]+1
-        ii = (targets['BGS_TARGET'] & bgs_mask.BGS_WISE) != 0
+        # ADM all three BGS classes get the same update, so test them
+        # ADM in a single pass over the BGS_TARGET column.
+        bgsclasses = bgs_mask.BGS_FAINT | bgs_mask.BGS_BRIGHT | bgs_mask.BGS_WISE
+        # ADM convert the mask to indices once, for both the read and write.
+        ii = np.flatnonzero((targets['BGS_TARGET'] & bgsclasses) != 0)
         nobs[ii] = targets['NUMOBS'][ii]+1
 
     return nobs
 
 
+@lru_cache(maxsize=None)
+def _galactic_north_pixels(nside):
+    """Read-only mask of (NESTED) HEALPixels north of the Galactic plane."""
+    from desitarget.geomask import is_in_gal_box
+    allpix = np.arange(hp.nside2npix(nside))
+    theta, phi = hp.pix2ang(nside, allpix, nest=True)
+    ra, dec = np.degrees(phi), 90-np.degrees(theta)
+    pixn = is_in_gal_box([ra, dec], [0., 360., 0., 90.], radec=True)
+    pixn.flags.writeable = False
+
+    return pixn
+
+
 def resolve(targets):
     """Resolve which targets are primary in imaging overlap regions.
 
@@ -737,29 +816,40 @@ def resolve(targets):
     # ADM grab the declination used to resolve targets.
     split = desitarget_resolve_dec()
 
+    # ADM extract the coordinates once as contiguous arrays rather
+    # ADM than repeatedly gathering them from the structured array.
+    ra = np.ascontiguousarray(targets["RA"])
+    dec = np.ascontiguousarray(targets["DEC"])
+
+    # ADM which targets are in the northern imaging area. Targets
+    # ADM south of the split can never be, so only targets north of
+    # ADM the split need to be checked against the Galactic plane.
+    arean = dec >= split
+    inorth = np.flatnonzero(arean)
+
     # ADM determine which targets are north of the Galactic plane. As
     # ADM a speed-up, bin in ~1 sq.deg. HEALPixels and determine
     # ADM which of those pixels are north of the Galactic plane.
     # ADM We should never be as close as ~1o to the plane.
-    from desitarget.geomask import is_in_gal_box, pixarea2nside
+    from desitarget.geomask import pixarea2nside
     nside = pixarea2nside(1)
-    theta, phi = np.radians(90-targets["DEC"]), np.radians(targets["RA"])
+    # ADM convert to native float64 (theta, phi) in preallocated
+    # ADM buffers, to avoid intermediate arrays and so that healpy
+    # ADM doesn't need to copy (possibly big-endian) inputs.
+    theta, phi = np.empty(len(inorth)), np.empty(len(inorth))
+    np.subtract(90., dec[inorth], out=theta)
+    np.radians(theta, out=theta)
+    np.radians(ra[inorth], out=phi)
     pixnum = hp.ang2pix(nside, theta, phi, nest=True)
-    # ADM find the pixels north of the Galactic plane...
-    allpix = np.arange(hp.nside2npix(nside))
-    theta, phi = hp.pix2ang(nside, allpix, nest=True)
-    ra, dec = np.degrees(phi), 90-np.degrees(theta)
-    pixn = is_in_gal_box([ra, dec], [0., 360., 0., 90.], radec=True)
     # ADM which targets are in pixels north of the Galactic plane.
-    galn = pixn[pixnum]
-
-    # ADM which targets are in the northern imaging area.
-    arean = (targets["DEC"] >= split) & galn
+    arean[inorth] = _galactic_north_pixels(nside)[pixnum]
 
     # ADM retain 'N' targets in 'N' area and 'S' in 'S' area.
-    keep = (photn & arean) | (~photn & ~arean)
+    keep = photn == arean
 
-    return targets[keep]
+    # ADM take() copies whole rows, which is far faster than boolean
+    # ADM indexing (which works field-by-field) for wide structured arrays.
+    return targets.take(np.flatnonzero(keep))
 
 
 def finalize(targets, desi_target, bgs_target, mws_target,
@@ -818,9 +908,10 @@ def finalize(targets, desi_target, bgs_target, mws_target,
 
     # - OBJID in tractor files is only unique within the brick; rename and
     # - create a new unique TARGETID
-    targets = rfn.rename_fields(targets,
-                                {'OBJID': 'BRICK_OBJID', 'TYPE': 'MORPHTYPE'})
-    targetid = encode_targetid(objid=targets['BRICK_OBJID'],
+    # ADM the renaming is applied when the output array is populated,
+    # ADM rather than making an extra copy of the input array.
+    rename = {'OBJID': 'BRICK_OBJID', 'TYPE': 'MORPHTYPE'}
+    targetid = encode_targetid(objid=targets['OBJID'],
                                brickid=targets['BRICKID'],
                                release=targets['RELEASE'],
                                sky=sky)
@@ -861,33 +952,42 @@ def finalize(targets, desi_target, bgs_target, mws_target,
 
     # ADM write the output array.
     newdt = [dt for dt in zip(cols, forms)]
-    done = np.array(np.zeros(len(targets)), dtype=targets.dtype.descr+newdt)
-    for col in targets.dtype.names:
-        done[col] = targets[col]
+    olddt = [(rename.get(dt[0], dt[0]),) + dt[1:] for dt in targets.dtype.descr]
+    done = np.zeros(ntargets, dtype=olddt+newdt)
+    # ADM this assignment is positional, so renamed columns line up.
+    done[[rename.get(col, col) for col in targets.dtype.names]] = targets
     for col, val in zip(cols, vals):
         done[col] = val
 
-    # ADM add PRIORITY/NUMOBS columns.
-    for edr, oc in zip(ender, obscon):
-        pc, nc = "PRIORITY_INIT"+edr, "NUMOBS_INIT"+edr
-        done[pc], done[nc] = initial_priority_numobs(done, obscon=oc)
+    # ADM add PRIORITY/NUMOBS columns, for all OBSCONDITIONS at once.
+    prionums = _initial_priority_numobs(done, obscon)
+    for edr, (priority, numobs) in zip(ender, prionums):
+        done["PRIORITY_INIT"+edr], done["NUMOBS_INIT"+edr] = priority, numobs
 
     # ADM set the OBSCONDITIONS.
     done["OBSCONDITIONS"] = set_obsconditions(done)
 
     # ADM some final checks that the targets conform to expectations...
-    # ADM check that each target has a unique ID.
-    if len(done["TARGETID"]) != len(set(done["TARGETID"])):
+    # ADM check that each target has a unique ID, by comparing
+    # ADM neighbours in a sorted copy rather than building a set.
+    # ADM TARGETIDs increase with OBJID, so targets from a single
+    # ADM brick are typically already sorted, and the sort can be
+    # ADM skipped if the IDs are strictly increasing.
+    targetid = done["TARGETID"]
+    sortedid = targetid
+    if not np.all(targetid[1:] > targetid[:-1]):
+        sortedid = np.sort(targetid)
+    if np.any(sortedid[1:] == sortedid[:-1]):
         msg = 'TARGETIDs are not unique!'
         log.critical(msg)
         raise AssertionError(msg)
 
     # ADM check all LRG targets have LRG_1PASS/2PASS set.
     if survey == 'main':
-        lrgset = done["DESI_TARGET"] & desi_mask.LRG != 0
-        pass1lrgset = done["DESI_TARGET"] & desi_mask.LRG_1PASS != 0
-        pass2lrgset = done["DESI_TARGET"] & desi_mask.LRG_2PASS != 0
-        if not np.all(lrgset == pass1lrgset | pass2lrgset):
+        desicol = done["DESI_TARGET"]
+        passbits = desi_mask.LRG_1PASS | desi_mask.LRG_2PASS
+        lrgset = (desicol & desi_mask.LRG) != 0
+        if np.any(lrgset != ((desicol & passbits) != 0)):
             msg = 'Some LRG targets do not have 1PASS/2PASS set!'
             log.critical(msg)
             raise AssertionError(msg)
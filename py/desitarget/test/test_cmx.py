@@ -25,6 +25,11 @@ class TestCMX(unittest.TestCase):
         cls.tractorfiles = sorted(io.list_tractorfiles(cls.datadir))
         cls.sweepfiles = sorted(io.list_sweepfiles(cls.datadir))
         cls.cmxdir = resource_filename('desitarget.test', 't3')
+        # ADM read the first tractor file once with each I/O library,
+        # ADM for the tests that check each type of input table.
+        cls.fitstargets = fits.getdata(cls.tractorfiles[0])
+        cls.tabletargets = Table.read(cls.tractorfiles[0])
+        cls.ndtargets = fitsio.read(cls.tractorfiles[0], upper=True)
 
     def test_cuts_basic(self):
         """Test cuts work with either data or filenames
@@ -68,20 +73,17 @@ class TestCMX(unittest.TestCase):
     def test_astropy_fits(self):
         """Test astropy.fits I/O library
         """
-        targets = fits.getdata(self.tractorfiles[0])
-        self._test_table_row(targets)
+        self._test_table_row(self.fitstargets)
 
     def test_astropy_table(self):
         """Test astropy tables I/O library
         """
-        targets = Table.read(self.tractorfiles[0])
-        self._test_table_row(targets)
+        self._test_table_row(self.tabletargets)
 
     def test_numpy_ndarray(self):
         """Test fitsio I/O library
         """
-        targets = fitsio.read(self.tractorfiles[0], upper=True)
-        self._test_table_row(targets)
+        self._test_table_row(self.ndtargets)
 
     def test_select_targets(self):
         """Test select targets works with either data or filenames
@@ -70,6 +70,29 @@ class TestCuts(unittest.TestCase):
             self.assertTrue(np.all(bgs1 == bgs2))
             self.assertTrue(np.all(mws1 == mws2))
 
+    def test_resolve_photsys(self):
+        """Test resolve() for unicode, bytes and object PHOTSYS columns
+        """
+        from desitarget.targets import resolve
+        n = 10000
+        rng = np.random.RandomState(1)
+        targets = np.zeros(n, dtype=[('RA', '>f8'), ('DEC', '>f8'),
+                                     ('PHOTSYS', 'U1')])
+        targets["RA"] = rng.uniform(0, 360, n)
+        targets["DEC"] = rng.uniform(-30, 90, n)
+        targets["PHOTSYS"] = rng.choice(['N', 'S'], n)
+        # ADM io.read_tractor (via add_photsys) produces unicode PHOTSYS.
+        photsys = io.read_tractor(self.sweepfiles[0])["PHOTSYS"]
+        self.assertEqual(photsys.dtype, targets["PHOTSYS"].dtype)
+        # ADM the fast paths should match the generic string comparison.
+        north = np.array([ps == 'N' for ps in targets["PHOTSYS"]])
+        self.assertTrue(np.all(cuts._isonnorthphotsys(targets["PHOTSYS"]) == north))
+        resolved = resolve(targets)
+        self.assertTrue(0 < len(resolved) < n)
+        for dt in ['S1', 'O']:
+            t2 = targets.astype([('RA', '>f8'), ('DEC', '>f8'), ('PHOTSYS', dt)])
+            self.assertTrue(np.all(resolve(t2)["RA"] == resolved["RA"]))
+
     def test_single_cuts(self):
         """Test cuts of individual target classes
         """
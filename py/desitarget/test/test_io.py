@@ -6,6 +6,7 @@ import unittest
 from pkg_resources import resource_filename
 import os.path
 from uuid import uuid4
+from unittest.mock import patch
 from astropy.io import fits
 import numpy as np
 import fitsio
@@ -118,6 +119,172 @@ class TestIO(unittest.TestCase):
             else:
                 self.assertTrue(np.all(data[column] == d2[column]))
 
+    def test_read_tractor_many(self):
+        """Test reading multiple files in serial and in parallel."""
+        tractorfiles = io.list_tractorfiles(self.datadir)
+        data = np.concatenate([io.read_tractor(fn) for fn in tractorfiles])
+        for numproc in [1, 2]:
+            d2 = io.read_tractor_many(tractorfiles, numproc=numproc)
+            self.assertTrue(np.all(data == d2))
+        columns = ['RA', 'DEC']
+        d2 = io.read_tractor_many(tractorfiles, columns=columns, numproc=2)
+        self.assertEqual(list(d2.dtype.names), columns)
+        self.assertEqual(len(d2), len(data))
+        # ADM no files should return no rows, with the full data model
+        # ADM (which is a superset of the pre-DR7 test data's columns).
+        for numproc in [1, 2]:
+            d2 = io.read_tractor_many([], numproc=numproc)
+            self.assertEqual(len(d2), 0)
+            self.assertTrue(set(data.dtype.names) <= set(d2.dtype.names))
+        d2 = io.read_tractor_many([], columns=columns)
+        self.assertEqual(list(d2.dtype.names), columns)
+
+    def test_read_targets_in_hp_dir(self):
+        """Test reading targets from a directory split by HEALPixel."""
+        import healpy as hp
+        from tempfile import mkdtemp
+        from shutil import rmtree
+        from desitarget.geomask import is_in_box, is_in_cap
+        targets = fitsio.read(os.path.join(self.datadir, 'targets.fits'),
+                              columns=['RA', 'DEC', 'RELEASE'])
+        nside = 32
+        theta, phi = np.radians(90-targets["DEC"]), np.radians(targets["RA"])
+        pixnum = hp.ang2pix(nside, theta, phi, nest=True)
+        # ADM write one file per HEALPixel.
+        hpdir = mkdtemp()
+        try:
+            for pix in set(pixnum):
+                hdr = fitsio.FITSHDR()
+                hdr['FILENSID'] = nside
+                hdr['FILEHPX'] = int(pix)
+                fn = os.path.join(hpdir, 'targets-hp-{}.fits'.format(pix))
+                fitsio.write(fn, targets[pixnum == pix],
+                             extname='TARGETS', header=hdr)
+            filenside, filedict = io.check_hp_target_dir(hpdir)
+            self.assertEqual(filenside, nside)
+            self.assertEqual(set(filedict), set(pixnum))
+            # ADM file names keep the form of the passed directory.
+            reldir = os.path.relpath(hpdir)
+            _, reldict = io.check_hp_target_dir(reldir)
+            self.assertTrue(all(fn.startswith(reldir) for fn in reldict.values()))
+            # ADM a second check of an unchanged directory is cached...
+            with patch.object(io.fitsio, 'read_header',
+                              wraps=fitsio.read_header) as mock:
+                self.assertEqual(io.check_hp_target_dir(hpdir),
+                                 (filenside, filedict))
+                mock.assert_not_called()
+                # ADM ...until a file is rewritten in place...
+                fn = os.path.join(hpdir, 'targets-hp-{}.fits'.format(pix))
+                st = os.stat(fn)
+                os.utime(fn, ns=(st.st_atime_ns, st.st_mtime_ns+10**9))
+                io.check_hp_target_dir(hpdir)
+                self.assertEqual(mock.call_count, len(filedict))
+                # ADM ...or the cache is cleared.
+                mock.reset_mock()
+                io._clear_hp_target_dir_cache()
+                io.check_hp_target_dir(hpdir)
+                self.assertEqual(mock.call_count, len(filedict))
+
+            # ADM check the HEALPixel, box and cap readers.
+            pix = pixnum[0]
+            t2 = io.read_targets_in_hp(hpdir, nside, [pix])
+            self.assertTrue(np.all(np.sort(t2["RA"]) ==
+                                   np.sort(targets["RA"][pixnum == pix])))
+            # ADM pixels with no file should return no targets.
+            t2 = io.read_targets_in_hp(hpdir, nside, [0], columns=['RA'])
+            self.assertEqual(len(t2), 0)
+            self.assertTrue('RA' in t2.dtype.names)
+            radecbox = [338.2, 338.8, -3., -1.]
+            t2 = io.read_targets_in_box(hpdir, radecbox)
+            ii = is_in_box(targets, radecbox)
+            self.assertTrue(np.all(np.sort(t2["RA"]) ==
+                                   np.sort(targets["RA"][ii])))
+            radecrad = [338.5, -2., 0.3]
+            t2 = io.read_targets_in_cap(hpdir, radecrad, columns=['RELEASE'])
+            ii = is_in_cap(targets, radecrad)
+            self.assertEqual(t2.dtype.names, ('RELEASE',))
+            self.assertEqual(len(t2), np.sum(ii))
+
+            # ADM files with a different data model should be flagged.
+            allpix = list(set(pixnum))
+            t2 = io.read_targets_in_hp(hpdir, nside, allpix)
+            self.assertEqual(len(t2), len(targets))
+            fn = os.path.join(hpdir, 'targets-hp-{}.fits'.format(pix))
+            retyped = np.zeros(np.sum(pixnum == pix), dtype=[
+                ('RA', '>f8'), ('DEC', '>f8'), ('RELEASE', '>i4')])
+            for col in retyped.dtype.names:
+                retyped[col] = targets[col][pixnum == pix]
+            pixhdr = fitsio.FITSHDR()
+            pixhdr['FILENSID'] = nside
+            pixhdr['FILEHPX'] = int(pix)
+            fitsio.write(fn, retyped, extname='TARGETS', header=pixhdr,
+                         clobber=True)
+            with self.assertRaises(ValueError):
+                io.read_targets_in_hp(hpdir, nside, allpix)
+
+            # ADM a duplicated HEALPixel should be flagged (adding a
+            # ADM file to the directory invalidates the cache).
+            fn = os.path.join(hpdir, 'targets-hp-dup.fits')
+            fitsio.write(fn, targets[pixnum == pix],
+                         extname='TARGETS', header=hdr)
+            with self.assertRaises(AssertionError):
+                io.check_hp_target_dir(hpdir)
+        finally:
+            rmtree(hpdir)
+
+    def test_load_pixweight_recarray(self):
+        """Test resampling a pixel map matches healpy's ud_grade."""
+        import healpy as hp
+        nside = 8
+        npix = hp.nside2npix(nside)
+        pixmap = np.zeros(npix, dtype=[('FRACAREA', '>f4'), ('EBV', '>f8'),
+                                       ('NOBS', '>i2'), ('HPXPIXEL', '>i8')])
+        pixmap["FRACAREA"] = np.random.RandomState(1).random_sample(npix)
+        pixmap["EBV"] = pixmap["FRACAREA"]*0.1
+        pixmap["EBV"][::5] = hp.UNSEEN
+        pixmap["NOBS"] = np.arange(npix) % 7
+        pixmap["HPXPIXEL"] = np.arange(npix)
+        for outnside in [2, 4, 8, 16]:
+            outmap = io.load_pixweight_recarray(None, outnside, pixmap=pixmap)
+            for col in ["FRACAREA", "EBV", "NOBS"]:
+                outcol = hp.ud_grade(pixmap[col], outnside,
+                                     order_in='NESTED', order_out='NESTED')
+                self.assertTrue(np.all(outmap[col] == outcol))
+            self.assertTrue(np.all(outmap["HPXPIXEL"] ==
+                                   np.arange(hp.nside2npix(outnside))))
+
+    def test_release_to_photsys(self):
+        """Test RELEASE is converted to PHOTSYS (and bad RELEASEs fail)."""
+        release = np.array([3000, 4000, 8000, 8001], dtype='>i2')
+        photsys = io.release_to_photsys(release)
+        self.assertEqual(list(photsys), [b'S', b'N', b'S', b'N'])
+        # ADM unknown release numbers, including ones beyond the
+        # ADM largest known release number, should raise an error.
+        for badrel in [1, 9000]:
+            with self.assertRaises(ValueError):
+                io.release_to_photsys(np.append(release, badrel))
+
+    def test_add_hpxpixel(self):
+        """Test HPXPIXEL is appended without padding from the input."""
+        import healpy as hp
+        data = np.zeros(10, dtype=[('OBJID', '>i4'), ('RA', '>f8'),
+                                   ('FLUX', '>f4'), ('DEC', '>f8')])
+        data["RA"], data["DEC"] = np.linspace(0, 350, 10), np.linspace(-80, 80, 10)
+        # ADM a multi-field view isn't packed, so its descr has padding.
+        outdata = io._add_hpxpixel(data[['RA', 'DEC']], 16)
+        self.assertEqual(outdata.dtype.names, ('RA', 'DEC', 'HPXPIXEL'))
+        self.assertTrue(np.all(outdata["RA"] == data["RA"]))
+        self.assertTrue(np.all(outdata["DEC"] == data["DEC"]))
+        theta, phi = np.radians(90-data["DEC"]), np.radians(data["RA"])
+        self.assertTrue(np.all(outdata["HPXPIXEL"] ==
+                               hp.ang2pix(16, theta, phi, nest=True)))
+
+    def test_drstring(self):
+        """Test the Data Release string is parsed from a directory."""
+        self.assertEqual(io._drstring('/global/dr7/legacysurvey/dr10/south'), 'dr10')
+        self.assertEqual(io._drstring('/global/dr8'), 'dr8')
+        self.assertEqual(io._drstring('/global/legacysurvey/sweep'), 'dr?')
+
     def test_brickname(self):
         self.assertEqual(io.brickname_from_filename('tractor-3301m002.fits'), '3301m002')
         self.assertEqual(io.brickname_from_filename('tractor-3301p002.fits'), '3301p002')